@@ -156,6 +156,14 @@ def clear_cache():
                 except Exception as e:
                     logger.warning(f"Failed to process {file_path}: {e}")
             
+            for file_path in cache_dir.glob("*.mp3.part*"):
+                try:
+                    track_id = file_path.name.split(".", 1)[0]
+                    if not track_id.isdigit() or int(track_id) not in liked_track_ids:
+                        file_path.unlink()
+                except Exception as e:
+                    logger.warning(f"Failed to remove partial file {file_path}: {e}")
+            
             logger.info(f"Cache cleared: {deleted_count} files deleted, {preserved_count} liked tracks preserved")
         except Exception as e:
             logger.error(f"Error clearing cache: {e}")
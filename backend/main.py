@@ -1,16 +1,23 @@
 import asyncio
 import os
+import math
+import time
 import tempfile
 import json
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
 from pathlib import Path
 from typing import Optional, List
-from urllib.parse import quote
+from urllib.parse import quote, urlparse
 import unicodedata
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import StreamingResponse, FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from sclib.asyncio import SoundcloudAPI, Track, Playlist
+import sclib.asyncio as sclib_asyncio
 import aiohttp
 import logging
 
@@ -49,6 +56,8 @@ TEMP_DIR.mkdir(exist_ok=True)
 DATA_DIR = Path.home() / ".soundnext"
 DATA_DIR.mkdir(exist_ok=True)
 LIKES_FILE = DATA_DIR / "liked_tracks.json"
+ARTWORK_DIR = DATA_DIR / "artwork"
+ARTWORK_DIR.mkdir(exist_ok=True)
 
 class TrackInfo(BaseModel):
     url: str
@@ -63,6 +72,707 @@ class TrackInfo(BaseModel):
 class SearchResult(BaseModel):
     tracks: List[TrackInfo]
 
+UPSTREAM_RATE = 10.0
+UPSTREAM_BURST = 20
+UPSTREAM_INITIAL_LIMIT = 8
+UPSTREAM_INTERACTIVE_RESERVE = 1
+UPSTREAM_MIN_LIMIT = UPSTREAM_INTERACTIVE_RESERVE + 1
+UPSTREAM_MAX_LIMIT = 32
+UPSTREAM_TARGET_LATENCY = 1.5
+UPSTREAM_DECREASE_INTERVAL = 2.0
+UPSTREAM_MAX_RETRIES = 3
+UPSTREAM_MAX_RETRY_WAIT = 10.0
+UPSTREAM_DEFAULT_RETRY_AFTER = 1.0
+UPSTREAM_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30)
+UPSTREAM_LANES = ("interactive", "background")
+
+class UpstreamPriority:
+    def __init__(self, lane: str):
+        self.lane = lane
+        self.pending = set()
+
+upstream_priority = ContextVar("upstream_priority", default=UpstreamPriority("interactive"))
+
+class UpstreamRateLimited(HTTPException):
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail="SoundCloud rate limit reached, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+
+def parse_retry_after(value: Optional[str]) -> float:
+    if not value:
+        return UPSTREAM_DEFAULT_RETRY_AFTER
+    if value.strip().isdigit():
+        return float(value.strip())
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return UPSTREAM_DEFAULT_RETRY_AFTER
+
+class UpstreamGateway:
+    def __init__(self):
+        self.tokens = float(UPSTREAM_BURST)
+        self.refilled_at = time.monotonic()
+        self.limit = float(UPSTREAM_INITIAL_LIMIT)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.decreased_at = 0.0
+        self.latency = None
+        self.timer = None
+        self.queues = {lane: deque() for lane in UPSTREAM_LANES}
+        self.metrics = {
+            "requests": 0,
+            "throttled": 0,
+            "retries": 0,
+            "rejected": 0,
+            "errors": 0,
+            "max_queue_depth": 0,
+        }
+    
+    def refill(self, now: float):
+        self.tokens = min(UPSTREAM_BURST, self.tokens + (now - self.refilled_at) * UPSTREAM_RATE)
+        self.refilled_at = now
+    
+    def next_lane(self) -> Optional[str]:
+        for queue in self.queues.values():
+            while queue and queue[0].done():
+                queue.popleft()
+        
+        limit = math.floor(self.limit)
+        if self.queues["interactive"] and self.in_flight < limit:
+            return "interactive"
+        if self.queues["background"] and limit - self.in_flight > UPSTREAM_INTERACTIVE_RESERVE:
+            return "background"
+        return None
+    
+    def schedule(self, delay: float):
+        if self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(delay, self.on_timer)
+    
+    def on_timer(self):
+        self.timer = None
+        self.dispatch()
+    
+    def dispatch(self):
+        now = time.monotonic()
+        self.refill(now)
+        
+        while (lane := self.next_lane()) is not None:
+            if now < self.blocked_until:
+                self.schedule(self.blocked_until - now)
+                return
+            if self.tokens < 1:
+                self.schedule((1 - self.tokens) / UPSTREAM_RATE)
+                return
+            
+            self.tokens -= 1
+            self.in_flight += 1
+            self.queues[lane].popleft().set_result(None)
+    
+    async def acquire(self, priority: UpstreamPriority):
+        future = asyncio.get_running_loop().create_future()
+        self.queues[priority.lane].append(future)
+        priority.pending.add(future)
+        depth = sum(len(queue) for queue in self.queues.values())
+        self.metrics["max_queue_depth"] = max(self.metrics["max_queue_depth"], depth)
+        self.dispatch()
+        
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            priority.pending.discard(future)
+    
+    def promote(self, priority: UpstreamPriority):
+        if priority.lane == "interactive":
+            return
+        priority.lane = "interactive"
+        for future in priority.pending:
+            if future in self.queues["background"]:
+                self.queues["background"].remove(future)
+                self.queues["interactive"].append(future)
+        self.dispatch()
+    
+    def release(self):
+        self.in_flight -= 1
+        self.dispatch()
+    
+    def decrease(self, factor: float):
+        now = time.monotonic()
+        if now - self.decreased_at >= UPSTREAM_DECREASE_INTERVAL:
+            self.limit = max(UPSTREAM_MIN_LIMIT, self.limit * factor)
+            self.decreased_at = now
+    
+    def on_response(self, latency: float):
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        if latency > UPSTREAM_TARGET_LATENCY:
+            self.decrease(0.8)
+        elif self.in_flight >= math.floor(self.limit) - 1:
+            self.limit = min(UPSTREAM_MAX_LIMIT, self.limit + 1 / self.limit)
+    
+    def on_throttled(self, retry_after: float):
+        self.metrics["throttled"] += 1
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        self.decrease(0.5)
+    
+    @asynccontextmanager
+    async def request(self, method: str, url: str, session: Optional[aiohttp.ClientSession] = None,
+                      priority: Optional[UpstreamPriority] = None, **kwargs):
+        priority = priority or upstream_priority.get()
+        owns_session = session is None
+        if owns_session:
+            session = aiohttp.ClientSession(timeout=UPSTREAM_TIMEOUT)
+        
+        try:
+            attempt = 0
+            while True:
+                await self.acquire(priority)
+                self.metrics["requests"] += 1
+                started = time.monotonic()
+                try:
+                    response = await session.request(method, url, **kwargs)
+                except BaseException:
+                    self.metrics["errors"] += 1
+                    self.release()
+                    raise
+                
+                if response.status == 429:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    response.release()
+                    self.on_throttled(retry_after)
+                    self.release()
+                    
+                    attempt += 1
+                    if attempt > UPSTREAM_MAX_RETRIES or retry_after > UPSTREAM_MAX_RETRY_WAIT:
+                        self.metrics["rejected"] += 1
+                        logger.warning(f"Upstream rate limited, giving up after {attempt} attempts: {url.split('?')[0]}")
+                        raise UpstreamRateLimited(retry_after)
+                    
+                    self.metrics["retries"] += 1
+                    logger.warning(f"Upstream rate limited, retrying in {retry_after:.1f}s: {url.split('?')[0]}")
+                    continue
+                
+                self.on_response(time.monotonic() - started)
+                self.release()
+                try:
+                    yield response
+                finally:
+                    response.release()
+                return
+        finally:
+            if owns_session:
+                await session.close()
+    
+    def snapshot(self) -> dict:
+        return {
+            **self.metrics,
+            "queue_depth": {lane: sum(1 for f in queue if not f.done()) for lane, queue in self.queues.items()},
+            "in_flight": self.in_flight,
+            "concurrency_limit": round(self.limit, 2),
+            "tokens": round(self.tokens, 2),
+            "blocked_for": round(max(0.0, self.blocked_until - time.monotonic()), 2),
+            "latency_ewma": round(self.latency, 3) if self.latency is not None else None,
+        }
+
+upstream = UpstreamGateway()
+
+async def upstream_get_resource(url) -> bytes:
+    async with upstream.request("GET", url) as response:
+        return await response.content.read()
+
+async def upstream_get_obj_from(url):
+    try:
+        return json.loads(await upstream_get_resource(url))
+    except UpstreamRateLimited:
+        raise
+    except Exception as e:
+        logger.error(f"Upstream request failed: {type(e).__name__}: {e}")
+        return False
+
+sclib_asyncio.get_resource = upstream_get_resource
+sclib_asyncio.get_obj_from = upstream_get_obj_from
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_MAX_RETRIES = 5
+DOWNLOAD_RETRY_DELAY = 1.0
+DOWNLOAD_MAX_RESTARTS = 2
+SEGMENTED_MIN_SIZE = 4 * 1024 * 1024
+SEGMENT_COUNT = 4
+DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30)
+
+MPEG1_LAYER3_BITRATES = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
+MPEG2_LAYER3_BITRATES = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+MPEG_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    0: [11025, 12000, 8000],
+}
+
+download_metrics = {
+    "active": 0,
+    "started": 0,
+    "completed": 0,
+    "failed": 0,
+    "retries": 0,
+    "resumes": 0,
+    "resumed_bytes": 0,
+    "segmented": 0,
+    "verification_failures": 0,
+    "bytes_downloaded": 0,
+}
+download_locks = {}
+
+class DownloadError(Exception):
+    pass
+
+class RetryableDownloadError(DownloadError):
+    pass
+
+class StreamUrlExpired(DownloadError):
+    pass
+
+class UpstreamFileChanged(DownloadError):
+    pass
+
+def mp3_frame_length(header: bytes) -> Optional[int]:
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+    
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    
+    sample_rate = MPEG_SAMPLE_RATES[version][sample_rate_index]
+    if version == 3:
+        return 144 * MPEG1_LAYER3_BITRATES[bitrate_index] * 1000 // sample_rate + padding
+    return 72 * MPEG2_LAYER3_BITRATES[bitrate_index] * 1000 // sample_rate + padding
+
+def verify_mp3(file_path: Path, expected_size: Optional[int]):
+    size = file_path.stat().st_size
+    if size == 0:
+        raise DownloadError("Downloaded file is empty")
+    if expected_size is not None and size != expected_size:
+        raise DownloadError(f"Size mismatch: expected {expected_size} bytes, got {size}")
+    
+    with open(file_path, 'rb') as file:
+        offset = 0
+        header = file.read(10)
+        if len(header) == 10 and header[:3] == b"ID3":
+            tag_size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+            offset = 10 + tag_size + (10 if header[5] & 0x10 else 0)
+        
+        frames = 0
+        trailing_tag = False
+        while offset + 4 <= size:
+            file.seek(offset)
+            header = file.read(4)
+            frame_length = mp3_frame_length(header)
+            if frame_length is None:
+                if frames and header[:3] in (b"TAG", b"APE", b"LYR"):
+                    trailing_tag = True
+                    break
+                raise DownloadError(f"MP3 frame sync lost at byte {offset}")
+            offset += frame_length
+            frames += 1
+        
+        if frames == 0:
+            raise DownloadError("No MP3 frames found")
+        if not trailing_tag and offset > size:
+            raise DownloadError(f"Last MP3 frame truncated: ends at byte {offset}, file has {size}")
+
+def merge_segments(part_path: Path, segment_paths: List[Path]):
+    with open(part_path, 'wb') as part_file:
+        for segment_path in segment_paths:
+            with open(segment_path, 'rb') as segment_file:
+                while chunk := segment_file.read(DOWNLOAD_CHUNK_SIZE):
+                    part_file.write(chunk)
+    for segment_path in segment_paths:
+        segment_path.unlink()
+
+def write_track_tags(track: Track, part_path: Path, album_artwork: Optional[bytes]):
+    with open(part_path, 'rb+') as file:
+        track.write_track_id3(file, album_artwork)
+
+def check_stream_status(status: int, description: str):
+    if status == 403:
+        raise StreamUrlExpired(f"Stream URL rejected (403) for {description}")
+    if status >= 500:
+        raise RetryableDownloadError(f"Upstream error {status} for {description}")
+    raise DownloadError(f"Unexpected status {status} for {description}")
+
+def remove_partial_files(file_path: Path):
+    for partial_path in file_path.parent.glob(f"{file_path.name}.part*"):
+        try:
+            partial_path.unlink()
+        except OSError as e:
+            logger.warning(f"Failed to remove partial file {partial_path}: {e}")
+
+async def probe_stream(session: aiohttp.ClientSession, stream_url: str):
+    async with upstream.request("GET", stream_url, session=session, headers={"Range": "bytes=0-0"}) as response:
+        etag = response.headers.get("ETag")
+        validator = etag if etag and not etag.startswith("W/") else response.headers.get("Last-Modified")
+        
+        if response.status == 206:
+            total = response.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+            if total.isdigit():
+                return int(total), True, validator
+        if response.status in (200, 206):
+            length = response.headers.get("Content-Length")
+            if response.status == 200 and length and length.isdigit():
+                return int(length), False, validator
+            return None, False, validator
+        check_stream_status(response.status, "stream probe")
+
+async def fetch_range(session: aiohttp.ClientSession, stream_url: str, part_path: Path,
+                      start: int, end: Optional[int], supports_ranges: bool, validator: Optional[str] = None):
+    expected = end - start + 1 if end is not None else None
+    attempt = 0
+    
+    while True:
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        if expected is not None and offset > expected:
+            part_path.unlink()
+            offset = 0
+        if expected is not None and offset == expected:
+            return
+        
+        headers = {}
+        if supports_ranges:
+            headers["Range"] = f"bytes={start + offset}-{end}"
+            if validator:
+                headers["If-Range"] = validator
+        elif offset:
+            part_path.unlink()
+            offset = 0
+        
+        try:
+            async with upstream.request("GET", stream_url, session=session, headers=headers) as response:
+                if response.status == 206 and supports_ranges:
+                    mode = 'ab'
+                elif response.status == 200 and "If-Range" in headers:
+                    raise UpstreamFileChanged(f"Upstream file changed while fetching {part_path.name}")
+                elif response.status == 200 and start == 0 and response.content_length in (None, expected):
+                    mode = 'wb'
+                    offset = 0
+                else:
+                    check_stream_status(response.status, f"range {start + offset}-{end}")
+                
+                if offset:
+                    download_metrics["resumes"] += 1
+                    download_metrics["resumed_bytes"] += offset
+                    logger.info(f"Resuming {part_path.name} from byte {offset}")
+                
+                with open(part_path, mode) as file:
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        file.write(chunk)
+                        download_metrics["bytes_downloaded"] += len(chunk)
+            
+            if expected is None or part_path.stat().st_size == expected:
+                return
+            raise RetryableDownloadError(f"Connection closed early for {part_path.name}")
+        
+        except (aiohttp.ClientError, asyncio.TimeoutError, RetryableDownloadError) as e:
+            attempt += 1
+            if attempt > DOWNLOAD_MAX_RETRIES:
+                raise
+            download_metrics["retries"] += 1
+            delay = DOWNLOAD_RETRY_DELAY * 2 ** (attempt - 1)
+            logger.warning(f"Download of {part_path.name} interrupted ({e}), retry {attempt} in {delay}s")
+            await asyncio.sleep(delay)
+
+async def fetch_stream(session: aiohttp.ClientSession, stream_url: str, file_path: Path) -> Optional[int]:
+    part_path = file_path.with_name(file_path.name + ".part")
+    validator_path = file_path.with_name(file_path.name + ".part.validator")
+    
+    total, supports_ranges, validator = await probe_stream(session, stream_url)
+    
+    previous_validator = validator_path.read_text() if validator_path.exists() else None
+    if not validator or previous_validator != validator:
+        remove_partial_files(file_path)
+    if validator:
+        validator_path.write_text(validator)
+    
+    if supports_ranges and total >= SEGMENTED_MIN_SIZE:
+        download_metrics["segmented"] += 1
+        if part_path.exists() and part_path.stat().st_size != total:
+            part_path.unlink()
+        
+        if not part_path.exists():
+            segment_size = -(-total // SEGMENT_COUNT)
+            segments = []
+            for index in range(SEGMENT_COUNT):
+                start = index * segment_size
+                end = min(start + segment_size, total) - 1
+                segments.append((file_path.with_name(f"{part_path.name}.{index}"), start, end))
+            
+            tasks = [
+                asyncio.create_task(fetch_range(session, stream_url, segment_path, start, end, True, validator))
+                for segment_path, start, end in segments
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            
+            await asyncio.to_thread(merge_segments, part_path, [segment_path for segment_path, _, _ in segments])
+    else:
+        end = total - 1 if total is not None else None
+        await fetch_range(session, stream_url, part_path, 0, end, supports_ranges, validator)
+    
+    return total
+
+async def fetch_track_file(track: Track, file_path: Path):
+    part_path = file_path.with_name(file_path.name + ".part")
+    
+    async with aiohttp.ClientSession(timeout=DOWNLOAD_TIMEOUT) as session:
+        restarts = 0
+        while True:
+            stream_url = await track.get_stream_url()
+            if not stream_url:
+                raise DownloadError("Could not get stream URL")
+            
+            try:
+                total = await fetch_stream(session, stream_url, file_path)
+                break
+            except (StreamUrlExpired, UpstreamFileChanged) as e:
+                restarts += 1
+                if restarts > DOWNLOAD_MAX_RESTARTS:
+                    raise
+                if isinstance(e, UpstreamFileChanged):
+                    remove_partial_files(file_path)
+                logger.warning(f"Restarting download of {file_path.name} with a fresh stream URL: {e}")
+        
+        try:
+            await asyncio.to_thread(verify_mp3, part_path, total)
+        except DownloadError:
+            download_metrics["verification_failures"] += 1
+            remove_partial_files(file_path)
+            raise
+        
+        album_artwork = None
+        if track.artwork_url:
+            try:
+                artwork_url = track.artwork_url.replace("large", "t300x300")
+                async with upstream.request("GET", artwork_url, session=session) as response:
+                    if response.status == 200:
+                        album_artwork = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError, UpstreamRateLimited) as e:
+                logger.warning(f"Failed to fetch artwork for {track.id}: {e}")
+    
+    await asyncio.to_thread(write_track_tags, track, part_path, album_artwork)
+    
+    os.replace(part_path, file_path)
+    remove_partial_files(file_path)
+
+async def download_track_file(track: Track, file_path: Path):
+    priority = upstream_priority.get()
+    entry = download_locks.setdefault(track.id, {
+        "lock": asyncio.Lock(),
+        "users": 0,
+        "priority": UpstreamPriority(priority.lane),
+    })
+    entry["users"] += 1
+    if priority.lane == "interactive":
+        upstream.promote(entry["priority"])
+    
+    try:
+        async with entry["lock"]:
+            if file_path.exists():
+                return
+            
+            download_metrics["started"] += 1
+            download_metrics["active"] += 1
+            token = upstream_priority.set(entry["priority"])
+            try:
+                await fetch_track_file(track, file_path)
+                download_metrics["completed"] += 1
+            except Exception:
+                download_metrics["failed"] += 1
+                raise
+            finally:
+                upstream_priority.reset(token)
+                download_metrics["active"] -= 1
+    finally:
+        entry["users"] -= 1
+        if entry["users"] == 0:
+            download_locks.pop(track.id, None)
+
+ARTWORK_SIZES = ("mini", "tiny", "small", "badge", "t67x67", "large", "t300x300", "crop", "t500x500", "original")
+ARTWORK_PREFETCH_SIZE = "t67x67"
+ARTWORK_PREFETCH_CONCURRENCY = 8
+ARTWORK_MEMORY_CACHE_BYTES = 32 * 1024 * 1024
+ARTWORK_DISK_CACHE_BYTES = 256 * 1024 * 1024
+ARTWORK_CACHE_CONTROL = "public, max-age=31536000, immutable"
+ARTWORK_URL_CACHE_SIZE = 4096
+ARTWORK_HOST_SUFFIX = ".sndcdn.com"
+
+artwork_urls = OrderedDict()
+artwork_memory_cache = OrderedDict()
+artwork_fetches = {}
+artwork_prefetch_semaphore = asyncio.Semaphore(ARTWORK_PREFETCH_CONCURRENCY)
+artwork_metrics = {
+    "memory_hits": 0,
+    "disk_hits": 0,
+    "fetches": 0,
+    "fetch_failures": 0,
+    "prefetched": 0,
+    "memory_bytes": 0,
+    "disk_bytes": None,
+}
+
+def is_soundcloud_artwork_url(url: str) -> bool:
+    parsed = urlparse(url)
+    return parsed.scheme == "https" and (parsed.hostname or "").endswith(ARTWORK_HOST_SUFFIX)
+
+def remember_artwork_url(track_id: int, artwork_url: Optional[str]):
+    if not artwork_url or not is_soundcloud_artwork_url(artwork_url):
+        return
+    artwork_urls[track_id] = artwork_url
+    artwork_urls.move_to_end(track_id)
+    while len(artwork_urls) > ARTWORK_URL_CACHE_SIZE:
+        artwork_urls.popitem(last=False)
+
+def remember_artwork(tracks):
+    for track in tracks:
+        remember_artwork_url(track.id, track.artwork_url)
+
+def artwork_media_type(data: bytes) -> str:
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    return "image/jpeg"
+
+def store_artwork_in_memory(key: str, data: bytes):
+    if key in artwork_memory_cache:
+        artwork_metrics["memory_bytes"] -= len(artwork_memory_cache.pop(key))
+    artwork_memory_cache[key] = data
+    artwork_metrics["memory_bytes"] += len(data)
+    
+    while artwork_metrics["memory_bytes"] > ARTWORK_MEMORY_CACHE_BYTES and artwork_memory_cache:
+        _, evicted = artwork_memory_cache.popitem(last=False)
+        artwork_metrics["memory_bytes"] -= len(evicted)
+
+def store_artwork_on_disk(key: str, data: bytes):
+    file_path = ARTWORK_DIR / f"{key}.img"
+    tmp_path = file_path.with_name(file_path.name + ".tmp")
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_path, file_path)
+    
+    if artwork_metrics["disk_bytes"] is None:
+        artwork_metrics["disk_bytes"] = sum(f.stat().st_size for f in ARTWORK_DIR.glob("*.img"))
+    else:
+        artwork_metrics["disk_bytes"] += len(data)
+    
+    if artwork_metrics["disk_bytes"] > ARTWORK_DISK_CACHE_BYTES:
+        files = sorted(ARTWORK_DIR.glob("*.img"), key=lambda f: f.stat().st_mtime)
+        total = sum(f.stat().st_size for f in files)
+        for old_file in files:
+            if total <= ARTWORK_DISK_CACHE_BYTES * 0.9:
+                break
+            total -= old_file.stat().st_size
+            old_file.unlink()
+        artwork_metrics["disk_bytes"] = total
+
+async def get_artwork_url(track_id: int) -> Optional[str]:
+    if track_id in artwork_urls:
+        artwork_urls.move_to_end(track_id)
+        return artwork_urls[track_id]
+    
+    remember_artwork(t for t in load_likes() if t.id == track_id)
+    if track_id in artwork_urls:
+        return artwork_urls[track_id]
+    
+    try:
+        tracks = await api.get_tracks(track_id)
+    except UpstreamRateLimited:
+        raise
+    except Exception as e:
+        logger.warning(f"Could not look up artwork for track {track_id}: {e}")
+        return None
+    
+    if tracks:
+        remember_artwork_url(track_id, tracks[0].get("artwork_url"))
+    return artwork_urls.get(track_id)
+
+async def fetch_artwork(track_id: int, size: str, priority: UpstreamPriority) -> Optional[bytes]:
+    upstream_priority.set(priority)
+    
+    artwork_url = await get_artwork_url(track_id)
+    if not artwork_url:
+        return None
+    
+    variant_url = artwork_url.replace("-large", f"-{size}")
+    if not is_soundcloud_artwork_url(variant_url):
+        logger.warning(f"Refusing to fetch artwork from non-SoundCloud URL for track {track_id}")
+        return None
+    
+    artwork_metrics["fetches"] += 1
+    async with upstream.request("GET", variant_url) as response:
+        if response.status != 200:
+            artwork_metrics["fetch_failures"] += 1
+            logger.warning(f"Artwork fetch failed ({response.status}): {variant_url}")
+            return None
+        data = await response.read()
+    
+    key = f"{track_id}-{size}"
+    store_artwork_on_disk(key, data)
+    store_artwork_in_memory(key, data)
+    return data
+
+async def get_artwork_image(track_id: int, size: str) -> Optional[bytes]:
+    key = f"{track_id}-{size}"
+    
+    if key in artwork_memory_cache:
+        artwork_memory_cache.move_to_end(key)
+        artwork_metrics["memory_hits"] += 1
+        return artwork_memory_cache[key]
+    
+    file_path = ARTWORK_DIR / f"{key}.img"
+    if file_path.exists():
+        data = file_path.read_bytes()
+        os.utime(file_path)
+        store_artwork_in_memory(key, data)
+        artwork_metrics["disk_hits"] += 1
+        return data
+    
+    priority = upstream_priority.get()
+    if key not in artwork_fetches:
+        shared_priority = UpstreamPriority(priority.lane)
+        task = asyncio.create_task(fetch_artwork(track_id, size, shared_priority))
+        artwork_fetches[key] = (task, shared_priority)
+        task.add_done_callback(lambda _: artwork_fetches.pop(key, None))
+    
+    task, shared_priority = artwork_fetches[key]
+    if priority.lane == "interactive":
+        upstream.promote(shared_priority)
+    return await asyncio.shield(task)
+
+async def prefetch_artwork(track_ids: List[int], size: str = ARTWORK_PREFETCH_SIZE):
+    upstream_priority.set(UpstreamPriority("background"))
+    
+    async def prefetch_one(track_id: int):
+        async with artwork_prefetch_semaphore:
+            try:
+                if await get_artwork_image(track_id, size) is not None:
+                    artwork_metrics["prefetched"] += 1
+            except Exception as e:
+                logger.warning(f"Artwork prefetch failed for {track_id}: {e}")
+    
+    await asyncio.gather(*[prefetch_one(track_id) for track_id in track_ids])
+
 @app.get("/")
 async def root():
     return {
@@ -70,6 +780,8 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
+            "metrics": "/metrics",
+            "artwork": "/artwork/{track_id}?size=t300x300",
             "search": "/search?q=track_name",
             "track_info": "/track-info?url=soundcloud_url",
             "stream": "/stream?url=soundcloud_url",
@@ -102,35 +814,37 @@ async def search_tracks(q: str, limit: int = 20):
             "offset": 0
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(search_url, params=params) as response:
-                if response.status != 200:
-                    raise HTTPException(status_code=response.status, detail="Failed to search tracks")
-                
-                data = await response.json()
-                
-                tracks = []
-                for item in data.get("collection", []):
-                    if item.get("kind") == "track":
-                        track = Track(obj=item, client=api)
-                        
-                        track_info = TrackInfo(
-                            url=track.permalink_url,
-                            artist=track.artist or "Unknown Artist",
-                            title=track.title,
-                            duration=track.duration or 0,
-                            artwork_url=track.artwork_url,
-                            id=track.id,
-                            playback_count=track.playback_count,
-                            likes_count=track.likes_count
-                        )
-                        tracks.append(track_info)
-                
-                if not tracks:
-                    raise HTTPException(status_code=404, detail="No tracks found")
-                
-                logger.info(f"Found {len(tracks)} tracks")
-                return SearchResult(tracks=tracks)
+        async with upstream.request("GET", search_url, params=params) as response:
+            if response.status != 200:
+                raise HTTPException(status_code=response.status, detail="Failed to search tracks")
+            
+            data = await response.json()
+            
+            tracks = []
+            for item in data.get("collection", []):
+                if item.get("kind") == "track":
+                    track = Track(obj=item, client=api)
+                    
+                    track_info = TrackInfo(
+                        url=track.permalink_url,
+                        artist=track.artist or "Unknown Artist",
+                        title=track.title,
+                        duration=track.duration or 0,
+                        artwork_url=track.artwork_url,
+                        id=track.id,
+                        playback_count=track.playback_count,
+                        likes_count=track.likes_count
+                    )
+                    tracks.append(track_info)
+            
+            if not tracks:
+                raise HTTPException(status_code=404, detail="No tracks found")
+            
+            remember_artwork(tracks)
+            asyncio.create_task(prefetch_artwork([t.id for t in tracks if t.artwork_url]))
+            
+            logger.info(f"Found {len(tracks)} tracks")
+            return SearchResult(tracks=tracks)
     
     except HTTPException:
         raise
@@ -150,6 +864,8 @@ async def get_track_info(url: str):
         if not isinstance(track, Track):
             raise HTTPException(status_code=400, detail="URL is not a valid track")
         
+        remember_artwork_url(track.id, track.artwork_url)
+        
         return TrackInfo(
             url=track.permalink_url,
             artist=track.artist,
@@ -224,15 +940,10 @@ async def stream_track(url: str):
         if not file_path.exists():
             logger.info(f"Downloading to: {file_path}")
             try:
-                with open(file_path, 'wb+') as file:
-                    await track.write_mp3_to(file)
-                
-                if not file_path.exists() or file_path.stat().st_size == 0:
-                    raise Exception("Failed to download track - file is empty")
-                    
+                await download_track_file(track, file_path)
+            except UpstreamRateLimited:
+                raise
             except Exception as download_error:
-                if file_path.exists():
-                    file_path.unlink()
                 logger.error(f"Download failed: {str(download_error)}")
                 raise HTTPException(
                     status_code=500, 
@@ -287,8 +998,7 @@ async def download_track(url: str):
         
         if not file_path.exists():
             logger.info(f"Downloading to: {file_path}")
-            with open(file_path, 'wb+') as file:
-                await track.write_mp3_to(file)
+            await download_track_file(track, file_path)
         
         encoded_filename = quote(filename)
         
@@ -334,6 +1044,8 @@ async def get_playlist(url: str):
                 )
                 tracks.append(track_info)
         
+        remember_artwork(tracks)
+        
         return {
             "title": playlist.title,
             "track_count": playlist.track_count,
@@ -346,9 +1058,32 @@ async def get_playlist(url: str):
         logger.error(f"Playlist error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get playlist: {str(e)}")
 
+@app.get("/artwork/{track_id}")
+async def get_artwork(track_id: int, size: str = "large"):
+    if size not in ARTWORK_SIZES:
+        raise HTTPException(status_code=400, detail=f"Invalid size. Allowed: {', '.join(ARTWORK_SIZES)}")
+    
+    try:
+        data = await get_artwork_image(track_id, size)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Artwork error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get artwork: {str(e)}")
+    
+    if data is None:
+        raise HTTPException(status_code=404, detail="Artwork not found")
+    
+    return Response(
+        content=data,
+        media_type=artwork_media_type(data),
+        headers={"Cache-Control": ARTWORK_CACHE_CONTROL}
+    )
+
 @app.delete("/cache/{track_id}")
 async def delete_cache(track_id: int):
     file_path = TEMP_DIR / f"{track_id}.mp3"
+    remove_partial_files(file_path)
     
     if file_path.exists():
         file_path.unlink()
@@ -363,6 +1098,8 @@ async def clear_cache():
     for file_path in TEMP_DIR.glob("*.mp3"):
         file_path.unlink()
         deleted_count += 1
+    for file_path in TEMP_DIR.glob("*.mp3.part*"):
+        file_path.unlink()
     
     logger.info(f"Cleared cache: {deleted_count} files deleted")
     return {"message": f"Cache cleared: {deleted_count} files deleted"}
@@ -379,7 +1116,17 @@ async def health_check():
         "cache_size_mb": round(cache_size / (1024 * 1024), 2)
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    return {
+        "upstream": upstream.snapshot(),
+        "downloads": dict(download_metrics),
+        "artwork": dict(artwork_metrics, memory_entries=len(artwork_memory_cache))
+    }
+
 async def cache_liked_track(track: TrackInfo):
+    upstream_priority.set(UpstreamPriority("background"))
+    
     try:
         file_path = TEMP_DIR / f"{track.id}.mp3"
         
@@ -399,8 +1146,7 @@ async def cache_liked_track(track: TrackInfo):
             logger.warning(f"Track is not streamable: {track.artist} - {track.title}")
             return
         
-        with open(file_path, 'wb+') as file:
-            await resolved_track.write_mp3_to(file)
+        await download_track_file(resolved_track, file_path)
         
         logger.info(f"Successfully cached: {track.artist} - {track.title}")
     except Exception as e:
@@ -452,6 +1198,7 @@ async def add_like(track: TrackInfo):
         
         likes.append(track)
         save_likes(likes)
+        remember_artwork([track])
         
         asyncio.create_task(cache_liked_track(track))
         
@@ -477,6 +1224,7 @@ async def remove_like(track_id: int):
         save_likes(likes)
         
         file_path = TEMP_DIR / f"{track_id}.mp3"
+        remove_partial_files(file_path)
         if file_path.exists():
             try:
                 file_path.unlink()
@@ -496,6 +1244,7 @@ async def remove_like(track_id: int):
 async def sync_likes(tracks: List[TrackInfo]):
     try:
         save_likes(tracks)
+        remember_artwork(tracks)
         logger.info(f"Synced {len(tracks)} liked tracks")
         return {"message": "Likes synced", "count": len(tracks)}
     except HTTPException:
@@ -101,7 +101,7 @@ export default function PlayerUI({ onToggleLike, isLiked }: PlayerUIProps) {
       <div className="mb-4 relative group shrink-0">
         {track.artwork_url ? (
           <img
-            src={track.artwork_url.replace("-large", "-t500x500")}
+            src={`${API_URL}/artwork/${track.id}?size=t500x500`}
             alt={track.title}
             className="w-full aspect-square rounded-2xl shadow-2xl object-cover transition-transform duration-500"
           />
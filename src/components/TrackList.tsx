@@ -2,6 +2,8 @@
 
 import { TrackInfo } from "@/types";
 
+const API_URL = "http://localhost:8000";
+
 interface TrackListProps {
   tracks: TrackInfo[];
   currentTrack: TrackInfo | null;
@@ -77,7 +79,7 @@ export default function TrackList({
               {track.artwork_url ? (
                 <>
                   <img
-                    src={track.artwork_url.replace("-large", "-t67x67")}
+                    src={`${API_URL}/artwork/${track.id}?size=t67x67`}
                     alt={track.title}
                     className={`w-14 h-14 rounded-xl object-cover transition-all duration-300 ${
                       currentTrack?.id === track.id 
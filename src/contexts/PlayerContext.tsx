@@ -173,8 +173,8 @@ export function PlayerProvider({ children }: { children: ReactNode }) {
           title: currentTrack.title,
           artist: currentTrack.artist,
           artwork: currentTrack.artwork_url ? [
-            { src: currentTrack.artwork_url.replace("-large", "-t500x500"), sizes: '500x500', type: 'image/jpeg' },
-            { src: currentTrack.artwork_url.replace("-large", "-t300x300"), sizes: '300x300', type: 'image/jpeg' },
+            { src: `${API_URL}/artwork/${currentTrack.id}?size=t500x500`, sizes: '500x500', type: 'image/jpeg' },
+            { src: `${API_URL}/artwork/${currentTrack.id}?size=t300x300`, sizes: '300x300', type: 'image/jpeg' },
           ] : []
         });
       }